@@ -1,31 +1,254 @@
+import io
 import re
+import sys
+from array import array
+from itertools import compress
+
+MEM_SIZE = 65536  # 64K address space; bounds checks compare against this
+ADDRESS_MASK = MEM_SIZE - 1  # Used instead of bounds checks by WrappingPicoEmulator
+# Return addresses live in their own small stack, not in data memory, so JSR
+# never overwrites program data. Nesting deeper than this is a "Stack overflow".
+STACK_SIZE = 256
+
+# --- OPCODES ---
+# Instructions are decoded once in parse() into an opcode_id, operands and
+# line_no per address, so step() can dispatch on a small int instead of
+# re-tokenizing.
+OPC_MOV = 0
+OPC_ADD = 1
+OPC_SUB = 2
+OPC_MUL = 3
+OPC_DIV = 4
+OPC_IN = 5
+OPC_OUT = 6
+OPC_BEQ = 7
+OPC_BGT = 8
+OPC_JSR = 9
+OPC_RTS = 10
+OPC_STOP = 11
+# Fused micro-ops, produced only by the peephole pass in parse()
+OPC_SUB_BEQ = 12
+OPC_SUB_BGT = 13
+# Sentinel filling every empty instruction slot; running into it ends the program
+OPC_END = 14
+# Operand-specialized forms, produced only by the specialization pass in parse()
+OPC_MOV_FAST = 15
+OPC_ADD_FAST = 16
+OPC_SUB_FAST = 17
+OPC_MUL_FAST = 18
+# Counter-loop tails ("SUB I, I, 1" + "BGT I, 0, L"), from the peephole pass
+OPC_STEP_BEQ = 19
+OPC_STEP_BGT = 20
+
+OPCODES = {
+    "MOV": OPC_MOV,
+    "ADD": OPC_ADD,
+    "SUB": OPC_SUB,
+    "MUL": OPC_MUL,
+    "DIV": OPC_DIV,
+    "IN": OPC_IN,
+    "OUT": OPC_OUT,
+    "BEQ": OPC_BEQ,
+    "BGT": OPC_BGT,
+    "JSR": OPC_JSR,
+    "RTS": OPC_RTS,
+    "STOP": OPC_STOP,
+}
+
+# --- LINE CLASSIFIER ---
+# Each source line is matched once; the comment is dropped and exactly one
+# of these shapes applies:
+#   "A = 10"           -> var, value
+#   "ORG 100"          -> org
+#   "LOOP: MOV A, B"   -> label (optional), instr (may be empty)
+LINE_RE = re.compile(
+    r"""\s*(?:
+        (?P<var>[^=;]*?)\s*=(?P<value>[^=;]*)[^;]*
+      | ORG\b\s*(?P<org>[^\s;]*)[^;]*
+      | (?:(?P<label>[^:;]*?)\s*:)?\s*(?P<instr>[^;]*?)
+    )\s*(?:;.*)?$""",
+    re.IGNORECASE | re.VERBOSE,
+)
+
+# --- OPERAND MODES ---
+# Operands are resolved once in parse() into (mode, payload) pairs:
+#   (MODE_IMMEDIATE, value)  -> "5", "#A", "#100"
+#   (MODE_DIRECT, addr)      -> "A"   (Memory[addr])
+#   (MODE_INDIRECT, ptr)     -> "(A)" (Memory[Memory[ptr]])
+#   (MODE_LABEL, pc)         -> "LOOP" (jump target)
+MODE_IMMEDIATE = 0
+MODE_DIRECT = 1
+MODE_INDIRECT = 2
+MODE_LABEL = 3
+
+# Operand roles per opcode: "W" = write target / start address,
+# "V" = value source, "L" = jump label.
+OPERAND_ROLES = {
+    OPC_MOV: "WV",
+    OPC_ADD: "WVV",
+    OPC_SUB: "WVV",
+    OPC_MUL: "WVV",
+    OPC_DIV: "WVV",
+    OPC_IN: "WV",
+    OPC_OUT: "WV",
+    OPC_BEQ: "VVL",
+    OPC_BGT: "VVL",
+    OPC_JSR: "L",
+    OPC_RTS: "",
+    OPC_STOP: "V",
+    OPC_SUB_BEQ: "WVVVVL",
+    OPC_SUB_BGT: "WVVVVL",
+    OPC_STEP_BEQ: "WVVVVL",
+    OPC_STEP_BGT: "WVVVVL",
+    OPC_END: "",
+    OPC_MOV_FAST: "WV",
+    OPC_ADD_FAST: "WVV",
+    OPC_SUB_FAST: "WVV",
+    OPC_MUL_FAST: "WVV",
+}
+
+# Operands after this many are optional (IN/OUT count, STOP value); every
+# other opcode takes exactly len(OPERAND_ROLES[opcode]) operands.
+MIN_OPERANDS = {OPC_IN: 1, OPC_OUT: 1, OPC_STOP: 0}
+
+# --- HOT BLOCK COMPILATION ---
+# run() counts taken back-edges per target PC. Once a loop head has been
+# jumped to HOT_BLOCK_THRESHOLD times, the straight-line run of simple
+# instructions starting there is compiled into one Python function. BEQ/BGT
+# to elsewhere become early exits; one back to the head closes the run into
+# a loop, so the whole loop is compiled.
+HOT_BLOCK_THRESHOLD = 50
+BLOCK_OPERATORS = {OPC_ADD: "+", OPC_SUB: "-", OPC_MUL: "*", OPC_DIV: "//"}
+BRANCH_OPERATORS = {OPC_BEQ: "==", OPC_BGT: ">"}
+
+# --- PEEPHOLE FUSION ---
+# "SUB T, A, B" directly followed by "BEQ/BGT T, X, LABEL" also gets a fused
+# record at parse time, so the pair costs a single dispatch and the branch
+# compares the difference without reading it back. Fused records live in
+# fused_records next to the program, which keeps both instructions: only
+# run() without breakpoints uses them (counting 2 instructions each), while
+# step() and breakpoint runs still stop on the branch's own PC.
+FUSED_BRANCHES = {OPC_BEQ: OPC_SUB_BEQ, OPC_BGT: OPC_SUB_BGT}
+
+# The commonest pair, a counter step "ADD/SUB X, X, #k" tested against an
+# immediate ("BEQ/BGT X, #c, LABEL"), gets a STEP record instead. It appends
+# (X, +/-k, c, target) to the six operands and its handler touches memory
+# exactly once. Like any fused record it only replaces the pair in run()
+# without breakpoints; compile_block() compiles the two instructions as is.
+STEP_BRANCHES = {OPC_BEQ: OPC_STEP_BEQ, OPC_BGT: OPC_STEP_BGT}
+
+# --- OPERAND SPECIALIZATION ---
+# MOV/ADD/SUB/MUL whose operands are all direct or immediate get a *_FAST
+# opcode. Their records append the destination address and a (source, index)
+# pair per value operand: (memory, addr) for direct, ((value,), 0) for
+# immediate. The handler then reads source[index] without checking the mode.
+# The original operands stay first in the record for compile_block().
+SPECIALIZED_OPCODES = {
+    OPC_MOV: OPC_MOV_FAST,
+    OPC_ADD: OPC_ADD_FAST,
+    OPC_SUB: OPC_SUB_FAST,
+    OPC_MUL: OPC_MUL_FAST,
+}
+GENERIC_OPCODES = {fast: opcode for opcode, fast in SPECIALIZED_OPCODES.items()}
+
+
+def _try_int(text):
+    """int(text) for a signed decimal literal, else None (without raising)."""
+    text = text.strip()
+    digits = text[1:] if text[:1] in ("-", "+") else text
+    if digits.isascii() and digits.isdigit():
+        return int(text)
+    return None
 
 
 class PicoEmulator:
+    # step() touches these on every instruction; slots keep the lookups off
+    # a per-instance __dict__
+    __slots__ = (
+        "_handlers",
+        "memory",
+        "pc",
+        "entry_pc",
+        "call_stack",
+        "sp",
+        "registers",
+        "labels",
+        "symbols",
+        "op_codes",
+        "line_nos",
+        "is_running",
+        "is_finished",
+        "output_buffer",
+        "last_error",
+        "input_needed",
+        "input_dest_addr",
+        "touched_memory",
+        "block_hits",
+        "compiled_blocks",
+        "fused_records",
+        "handler_stream",
+        "operand_stream",
+    )
+
     def __init__(self):
+        # Dispatch table indexed by opcode_id (see OPCODES)
+        self._handlers = [
+            self._op_mov,
+            self._op_add,
+            self._op_sub,
+            self._op_mul,
+            self._op_div,
+            self._op_in,
+            self._op_out,
+            self._op_beq,
+            self._op_bgt,
+            self._op_jsr,
+            self._op_rts,
+            self._op_stop,
+            self._op_sub_beq,
+            self._op_sub_bgt,
+            self._op_end,
+            # OPC_MOV_FAST..OPC_STEP_BGT are appended by reset()
+        ]
         self.reset()
 
     def reset(self):
         """Resets the emulator state to initial values."""
-        self.memory = [0] * 65536  # 64K memory space
+        self.memory = array("i", [0]) * MEM_SIZE  # 64K memory space (int32 words)
         self.pc = 0  # Program Counter
-        self.sp = 65500  # Stack Pointer (starts high, grows down)
+        self.entry_pc = 0  # Where the parsed program starts (last ORG)
+        self.call_stack = array("i", [0]) * STACK_SIZE  # Return addresses (JSR/RTS)
+        self.sp = 0  # Number of entries on call_stack
         self.registers = {}  # Symbol map (e.g., {"A": 10, "LOOP": 5})
         self.labels = {}  # Jump label map
-        self.instructions = {}  # Map: Address -> Instruction Data
+        self.symbols = {}  # Variables and labels in one namespace (variables win)
+        # The program, as parallel arrays indexed by address. Empty slots hold
+        # OPC_END; the extra slot past the end catches running off the last
+        # address. line_nos is only read to report errors.
+        self.op_codes = array("B", [OPC_END]) * (MEM_SIZE + 1)
+        self.operand_stream = [()] * (MEM_SIZE + 1)
+        self.line_nos = array("i", [0]) * (MEM_SIZE + 1)
 
         self.is_running = False
         self.is_finished = False
 
-        self.output_buffer = []  # Stores print outputs
+        self.output_buffer = io.StringIO()  # OUT/STOP text, one line each
         self.last_error = ""
 
         # Input handling state
         self.input_needed = 0
         self.input_dest_addr = 0
 
-        # Track modified memory for GUI updates
-        self.touched_memory = set()
+        # Track modified memory for GUI updates (one dirty byte per address)
+        self.touched_memory = bytearray(MEM_SIZE)
+        self._handlers[OPC_MOV_FAST:] = self._fast_handlers()
+
+        # Hot loop bookkeeping for run()
+        self.block_hits = {}  # Map: Loop head PC -> taken back-edges
+        self.compiled_blocks = {}  # Map: PC -> compiled block function
+        self.fused_records = {}  # Map: PC -> (fused handler, args), see parse()
+        # Threaded form of op_codes: the bound handler per PC
+        self.handler_stream = [self._op_end] * (MEM_SIZE + 1)
 
     def parse(self, source_code):
         """Parses assembly code, extracts labels/vars, and loads instructions."""
@@ -33,141 +256,310 @@ class PicoEmulator:
         lines = source_code.split("\n")
         current_address = 0
 
-        # Pass 1: Parsing
+        # Pass 1: Parsing (collect symbols, labels and raw instructions)
+        addresses = []  # Occupied instruction slots, in source order
         for idx, line in enumerate(lines):
-            # Strip comments and whitespace
-            line = line.split(";")[0].strip()
-            if not line:
-                continue
+            # One match strips the comment and classifies the line
+            match = LINE_RE.match(line)
 
             # 1. Variable Definition (e.g., A = 10)
-            if "=" in line:
-                parts = line.split("=")
-                name = parts[0].strip().upper()
-                try:
-                    val = int(parts[1].strip())
+            if match["value"] is not None:
+                name = sys.intern(match["var"].upper())
+                val = _try_int(match["value"])
+                if val is not None:
                     self.registers[name] = val
+                    self.symbols[name] = val
                     # Initialize memory location if it falls in FDA (0-7) or generic RAM
-                    if 0 <= val < len(self.memory):
+                    if 0 <= val < MEM_SIZE:
                         self.memory[val] = 0
-                        self.touched_memory.add(val)
-                except ValueError:
-                    pass
+                        self.touched_memory[val] = 1
                 continue
 
             # 2. ORG Directive (e.g., ORG 100)
-            if line.upper().startswith("ORG"):
-                try:
-                    parts = line.split()
-                    current_address = int(parts[1])
-                    self.pc = current_address  # Set start PC to ORG
-                except:
-                    pass
+            if match["org"] is not None:
+                org = _try_int(match["org"])
+                if org is None:
+                    continue
+                if not 0 <= org < MEM_SIZE:
+                    raise ValueError(f"Line {idx + 1}: ORG out of range: {org}")
+                current_address = org
+                self.pc = current_address  # Set start PC to ORG
                 continue
 
             # 3. Label Definition (e.g., LOOP:)
-            if ":" in line:
-                label_part, instr_part = line.split(":", 1)
-                label_name = label_part.strip().upper()
+            if match["label"] is not None:
+                label_name = sys.intern(match["label"].upper())
                 self.labels[label_name] = current_address
-                line = instr_part.strip()
+                if label_name not in self.registers:
+                    self.symbols[label_name] = current_address
+            line = match["instr"]
 
-            # 4. Instruction Store
+            # 4. Instruction Decode & Store
+            #    "BEQ (a1),( a2), eq" -> (OPC_BEQ, ("(A1)", "( A2)", "EQ"), line_no)
+            #    Splitting on commas keeps spaces within parentheses safe.
             if line:
-                self.instructions[current_address] = {"text": line, "line_no": idx + 1}
+                parts = line.split(maxsplit=1)
+                opcode = parts[0].upper()
+                if opcode not in OPCODES:
+                    raise ValueError(f"Line {idx + 1}: Unknown opcode: {opcode}")
+                args = ()
+                if len(parts) > 1:
+                    args = tuple(
+                        sys.intern(arg.strip().upper()) for arg in parts[1].split(",")
+                    )
+                if current_address >= MEM_SIZE:
+                    raise ValueError(f"Line {idx + 1}: Program exceeds memory")
+                if self.op_codes[current_address] == OPC_END:
+                    addresses.append(current_address)
+                self.op_codes[current_address] = OPCODES[opcode]
+                self.operand_stream[current_address] = args
+                self.line_nos[current_address] = idx + 1
                 current_address += 1
 
+        # Pass 2: Operand decoding (all symbols and labels are known by now,
+        # so forward jumps resolve to their target PC here, not on every jump)
+        # A decoded operand depends only on its role and text, so repeated
+        # operands ("R", "#1", "LOOP") are decoded once and share one tuple.
+        decoded = {}
+        for addr in addresses:
+            opcode = self.op_codes[addr]
+            args = self.operand_stream[addr]
+            line_no = self.line_nos[addr]
+            roles = OPERAND_ROLES[opcode]
+            # Arity is settled here so handlers can index args unchecked
+            if not MIN_OPERANDS.get(opcode, len(roles)) <= len(args) <= len(roles):
+                raise ValueError(f"Line {line_no}: Wrong number of operands")
+            operands = []
+            for role, arg in zip(roles, args):
+                operand = decoded.get((role, arg))
+                if operand is None:
+                    try:
+                        operand = self.decode_operand(role, arg)
+                    except ValueError as e:
+                        raise ValueError(f"Line {line_no}: {str(e)}")
+                    decoded[(role, arg)] = operand
+                operands.append(operand)
+            self.operand_stream[addr] = tuple(operands)
+
+        # Pass 3: Peephole fusion of ADD/SUB + BEQ/BGT on the ADD/SUB's result
+        # (into fused_records; op_codes keep both instructions)
+        for addr in addresses:
+            opcode = self.op_codes[addr]
+            operands = self.operand_stream[addr]
+            if opcode not in (OPC_ADD, OPC_SUB) or len(operands) != 3:
+                continue
+            if operands[0][0] != MODE_DIRECT:
+                continue
+            branch = self.op_codes[addr + 1]
+            if branch not in FUSED_BRANCHES:
+                continue
+            # The right-hand side must not be able to fail, or the error
+            # would be reported against the ADD/SUB's line
+            branch_operands = self.operand_stream[addr + 1]
+            if len(branch_operands) != 3 or branch_operands[0] != operands[0]:
+                continue
+            if branch_operands[1][0] == MODE_INDIRECT:
+                continue
+
+            counter, step = operands[0][1], operands[2]
+            limit, target = branch_operands[1], branch_operands[2]
+            if (
+                operands[1] == operands[0]
+                and step[0] == MODE_IMMEDIATE
+                and limit[0] == MODE_IMMEDIATE
+            ):
+                delta = step[1] if opcode == OPC_ADD else -step[1]
+                self.fused_records[addr] = (
+                    self._handlers[STEP_BRANCHES[branch]],
+                    operands + branch_operands + (counter, delta, limit[1], target[1]),
+                )
+            elif opcode == OPC_SUB:
+                self.fused_records[addr] = (
+                    self._handlers[FUSED_BRANCHES[branch]],
+                    operands + branch_operands,
+                )
+
+        # Pass 4: Operand specialization of MOV/ADD/SUB/MUL
+        sources = {}
+        for addr in addresses:
+            opcode = self.op_codes[addr]
+            operands = self.operand_stream[addr]
+            fast = SPECIALIZED_OPCODES.get(opcode)
+            if fast is None or len(operands) != len(OPERAND_ROLES[opcode]):
+                continue
+            dest_mode, dest = operands[0]
+            if dest_mode != MODE_DIRECT or not 0 <= dest < MEM_SIZE:
+                continue
+            if any(mode not in (MODE_DIRECT, MODE_IMMEDIATE) for mode, _ in operands):
+                continue
+            fetch = []
+            for mode, payload in operands[1:]:
+                if mode == MODE_DIRECT:
+                    fetch += (self.memory, payload)
+                else:
+                    if payload not in sources:
+                        sources[payload] = (payload,)
+                    fetch += (sources[payload], 0)
+            self.op_codes[addr] = fast
+            self.operand_stream[addr] = operands + (dest, *fetch)
+
+        # Thread the final opcodes: step()/run() call handler_stream[pc]
+        # directly instead of looking the handler up by opcode
+        for addr in addresses:
+            self.handler_stream[addr] = self._handlers[self.op_codes[addr]]
+        self.entry_pc = self.pc
+
+    def restart(self):
+        """
+        Rewinds the parsed program to its freshly loaded state without
+        parsing it again.
+
+        Memory and touched_memory are cleared in place: the decoded operands,
+        fast handlers and compiled blocks all hold references to them.
+        """
+        self.memory[:] = array("i", [0]) * MEM_SIZE
+        self.touched_memory[:] = bytes(MEM_SIZE)
+        for addr in self.registers.values():
+            if 0 <= addr < MEM_SIZE:
+                self.touched_memory[addr] = 1
+        self.pc = self.entry_pc
+        self.sp = 0
+        self.is_running = False
+        self.is_finished = False
+        self.get_output()  # Drop anything not yet collected
+        self.last_error = ""
+        self.input_needed = 0
+        self.input_dest_addr = 0
+
+    def touched_addresses(self):
+        """Returns the addresses written so far, in ascending order."""
+        # bytearray.find() is a C-level scan, so sparse maps stay cheap
+        find = self.touched_memory.find
+        addresses = []
+        addr = find(1)
+        while addr != -1:
+            addresses.append(addr)
+            addr = find(1, addr + 1)
+        return addresses
+
+    def source_map(self):
+        """Returns {address: 0-based source line} for the loaded instructions."""
+        line_nos = self.line_nos  # 1-based, 0 marks an empty slot
+        return {
+            addr: line_nos[addr] - 1 for addr in compress(range(MEM_SIZE), line_nos)
+        }
+
     def resolve_symbol(self, token):
-        """Resolves a raw string symbol to an address/value constant."""
-        token = token.strip().upper()
-        if token.isdigit() or (token.startswith("-") and token[1:].isdigit()):
-            return int(token)
-        if token in self.registers:
-            return self.registers[token]
-        if token in self.labels:
-            return self.labels[token]
+        """
+        Resolves a symbol to an address/value constant.
+
+        Tokens are normalized (stripped, uppercased, interned) once in parse().
+        """
+        val = _try_int(token)
+        if val is not None:
+            return val
+        val = self.symbols.get(token)
+        if val is not None:
+            return val
         raise ValueError(f"Unknown symbol: {token}")
 
-    def resolve_value(self, operand):
+    def decode_operand(self, role, operand):
         """
-        GETTER: Determines the value of an operand for calculation.
+        Converts an operand string into a (mode, payload) pair.
 
-        Syntaxes supported:
+        Syntaxes supported for values ("V"):
         1. "100"    -> Immediate Integer 100
         2. "#A"     -> Immediate value of symbol A (e.g., 5)
         3. "#100"   -> Immediate Integer 100
-        4. "A"      -> Direct: Returns Memory[A] (e.g., Memory[5])
-        5. "(A)"    -> Indirect: Returns Memory[Memory[A]]
+        4. "A"      -> Direct: Memory[A] (e.g., Memory[5])
+        5. "(A)"    -> Indirect: Memory[Memory[A]]
+
+        Write targets ("W") only know "A" (Memory[A]) and "(A)" (Memory[Memory[A]]).
+        Labels ("L") resolve to their target PC.
         """
-        operand = operand.strip().upper()
+        if role == "L":
+            if operand in self.labels:
+                return (MODE_LABEL, self.labels[operand])
+            raise ValueError(f"Unknown label: {operand}")
 
-        # Case 1: Indirect Addressing ((A))
+        # Indirect Addressing ((A)): payload is where the pointer is stored
         if operand.startswith("(") and operand.endswith(")"):
-            inner = operand[1:-1]
-            # Address where the pointer is stored
-            ptr_loc = self.resolve_symbol(inner)
-            # The actual target address
-            real_addr = self.memory[ptr_loc]
-            if 0 <= real_addr < len(self.memory):
-                return self.memory[real_addr]
-            raise ValueError(f"Indirect access out of bounds: {real_addr}")
-
-        # Case 2: Immediate Value (#A or #100)
+            return (MODE_INDIRECT, self.resolve_symbol(operand[1:-1].strip()))
+
+        if role == "W":
+            return (MODE_DIRECT, self.resolve_symbol(operand))
+
+        # Immediate Value (#A or #100)
         if operand.startswith("#"):
-            return self.resolve_symbol(operand[1:])
+            return (MODE_IMMEDIATE, self.resolve_symbol(operand[1:].strip()))
 
-        # Case 3: Raw Number (treated as Immediate in math, but Context matters)
+        # Raw Number (treated as Immediate in math, but Context matters)
         # In pC, "ADD A, 5, B" -> 5 is immediate.
         # But "ADD A, B, C" -> B and C are addresses.
-        # This function assumes if it's a number, it's a value.
-        if operand.isdigit() or (operand.startswith("-") and operand[1:].isdigit()):
-            return int(operand)
+        val = _try_int(operand)
+        if val is not None:
+            return (MODE_IMMEDIATE, val)
 
-        # Case 4: Direct Addressing (A)
+        # Direct Addressing (A)
         # It's a symbol (register/variable name), so we read the memory at that location.
         addr = self.resolve_symbol(operand)
-        if 0 <= addr < len(self.memory):
-            return self.memory[addr]
+        if 0 <= addr < MEM_SIZE:
+            return (MODE_DIRECT, addr)
 
         raise ValueError(f"Memory access out of bounds: {addr}")
 
+    def resolve_value(self, operand):
+        """GETTER: Determines the value of a decoded operand for calculation."""
+        mode, payload = operand
+        if mode == MODE_IMMEDIATE:
+            return payload
+        if mode == MODE_DIRECT:
+            return self.memory[payload]
+
+        # Indirect: payload holds the address of the pointer
+        real_addr = self.memory[payload]
+        if 0 <= real_addr < MEM_SIZE:
+            return self.memory[real_addr]
+        raise ValueError(f"Indirect access out of bounds: {real_addr}")
+
     def resolve_write_target(self, operand):
         """
         SETTER HELPER: determines the specific memory INDEX to write to.
 
-        Syntaxes supported:
-        1. "A"      -> Returns value of A (e.g., 5). We will write to Memory[5].
-        2. "(A)"    -> Read Memory[A] (e.g., 100). We will write to Memory[100].
+        1. (MODE_DIRECT, 5)    -> We will write to Memory[5].
+        2. (MODE_INDIRECT, 5)  -> Read Memory[5] (e.g., 100). We will write to Memory[100].
         """
-        operand = operand.strip().upper()
-
-        # Indirect Write: MOV (A), ...
-        if operand.startswith("(") and operand.endswith(")"):
-            inner = operand[1:-1]
-            ptr_loc = self.resolve_symbol(inner)  # e.g., 5
-            target_addr = self.memory[ptr_loc]  # e.g., 100
-            return target_addr
-
-        # Direct Write: MOV A, ...
-        return self.resolve_symbol(operand)
+        mode, payload = operand
+        if mode == MODE_INDIRECT:
+            return self.memory[payload]
+        return payload
 
     def set_value(self, operand, value):
-        """Writes value to the memory location calculated from operand."""
+        """Writes value (already an int) to the memory location calculated from operand."""
         dest_addr = self.resolve_write_target(operand)
 
-        if 0 <= dest_addr < len(self.memory):
-            self.memory[dest_addr] = int(value)
-            self.touched_memory.add(dest_addr)
+        if 0 <= dest_addr < MEM_SIZE:
+            self.memory[dest_addr] = value
+            self.touched_memory[dest_addr] = 1
         else:
             raise ValueError(f"Memory write out of bounds: {dest_addr}")
 
+    def get_output(self):
+        """Returns the output lines written since the last call and clears them."""
+        text = self.output_buffer.getvalue()
+        if not text:
+            return []
+        self.output_buffer.seek(0)
+        self.output_buffer.truncate()
+        return text.splitlines()
+
     def provide_input(self, value):
         """Called by GUI to provide input."""
         if self.input_needed > 0:
             try:
                 val = int(value)
                 self.memory[self.input_dest_addr] = val
-                self.touched_memory.add(self.input_dest_addr)
+                self.touched_memory[self.input_dest_addr] = 1
 
                 self.input_dest_addr += 1
                 self.input_needed -= 1
@@ -177,158 +569,402 @@ class PicoEmulator:
                     self.pc += 1
 
                 return True
-            except ValueError:
+            except (ValueError, OverflowError):
                 return False
         return False
 
+    # --- OPCODE HANDLERS ---
+    # Each handler receives the decoded args and returns the next PC,
+    # or None to fall through to PC + 1.
+
+    def _op_mov(self, args):
+        # MOV Dest, Src
+        self.set_value(args[0], self.resolve_value(args[1]))
+
+    def _op_add(self, args):
+        # Arithmetic: OP Dest, Src1, Src2
+        self.set_value(
+            args[0], self.resolve_value(args[1]) + self.resolve_value(args[2])
+        )
+
+    def _op_sub(self, args):
+        self.set_value(
+            args[0], self.resolve_value(args[1]) - self.resolve_value(args[2])
+        )
+
+    def _op_mul(self, args):
+        self.set_value(
+            args[0], self.resolve_value(args[1]) * self.resolve_value(args[2])
+        )
+
+    def _op_div(self, args):
+        val1 = self.resolve_value(args[1])
+        val2 = self.resolve_value(args[2])
+        if val2 == 0:
+            raise ValueError("Division by zero")
+        self.set_value(args[0], val1 // val2)
+
+    def _fast_handlers(self):
+        """
+        Builds the *_FAST and STEP_* handlers (see OPERAND SPECIALIZATION and
+        PEEPHOLE FUSION) as closures over the current memory and dirty map,
+        so the hottest handlers read them as cell variables instead of
+        attributes on every call.
+        """
+        memory = self.memory
+        touched = self.touched_memory
+
+        def mov_fast(args):
+            _, _, dest, src, i = args
+            memory[dest] = src[i]
+            touched[dest] = 1
+
+        def add_fast(args):
+            _, _, _, dest, src1, i1, src2, i2 = args
+            memory[dest] = src1[i1] + src2[i2]
+            touched[dest] = 1
+
+        def sub_fast(args):
+            _, _, _, dest, src1, i1, src2, i2 = args
+            memory[dest] = src1[i1] - src2[i2]
+            touched[dest] = 1
+
+        def mul_fast(args):
+            _, _, _, dest, src1, i1, src2, i2 = args
+            memory[dest] = src1[i1] * src2[i2]
+            touched[dest] = 1
+
+        def step_beq(args):
+            _, _, _, _, _, _, counter, delta, limit, target = args
+            value = memory[counter] + delta
+            memory[counter] = value
+            touched[counter] = 1
+            if value == limit:
+                return target
+            return self.pc + 2
+
+        def step_bgt(args):
+            _, _, _, _, _, _, counter, delta, limit, target = args
+            value = memory[counter] + delta
+            memory[counter] = value
+            touched[counter] = 1
+            if value > limit:
+                return target
+            return self.pc + 2
+
+        return [mov_fast, add_fast, sub_fast, mul_fast, step_beq, step_bgt]
+
+    def _op_in(self, args):
+        # IN Address, [Count]
+        # Supports Indirect: IN (A), 2
+        target_addr = self.resolve_write_target(args[0])
+
+        count = 1
+        if len(args) > 1:
+            count = self.resolve_value(args[1])
+
+        if count > 0:
+            self.input_needed = count
+            self.input_dest_addr = target_addr
+            # Do NOT advance PC yet
+            return self.pc
+
+    def _op_out(self, args):
+        # OUT Address, [Count]
+        # OUT A, 5   -> Start address is A's value.
+        # OUT (A), 5 -> Start address is the one pointed to by A.
+        start_addr = self.resolve_write_target(args[0])
+
+        count = 1
+        if len(args) > 1:
+            count = self.resolve_value(args[1])
+
+        if start_addr < 0:
+            raise ValueError(f"Memory access out of bounds: {start_addr}")
+
+        # One C-level slice (clipped at the end of memory) instead of a Python loop
+        values = self.memory[start_addr : start_addr + count]
+        self.output_buffer.write(" ".join(map(str, values)))
+        self.output_buffer.write("\n")
+
+    def _op_beq(self, args):
+        # BEQ Val1, Val2, Label
+        if self.resolve_value(args[0]) == self.resolve_value(args[1]):
+            return args[2][1]
+
+    def _op_bgt(self, args):
+        # BGT Val1, Val2, Label
+        if self.resolve_value(args[0]) > self.resolve_value(args[1]):
+            return args[2][1]
+
+    def _op_sub_beq(self, args):
+        # SUB T, A, B + BEQ T, X, Label
+        diff = self.resolve_value(args[1]) - self.resolve_value(args[2])
+        self.set_value(args[0], diff)
+        if diff == self.resolve_value(args[4]):
+            return args[5][1]
+        return self.pc + 2
+
+    def _op_sub_bgt(self, args):
+        # SUB T, A, B + BGT T, X, Label
+        diff = self.resolve_value(args[1]) - self.resolve_value(args[2])
+        self.set_value(args[0], diff)
+        if diff > self.resolve_value(args[4]):
+            return args[5][1]
+        return self.pc + 2
+
+    def _op_jsr(self, args):
+        if self.sp == STACK_SIZE:
+            raise ValueError("Stack overflow")
+        self.call_stack[self.sp] = self.pc + 1
+        self.sp += 1
+        return args[0][1]
+
+    def _op_rts(self, args):
+        if self.sp == 0:
+            raise ValueError("Stack underflow")
+        self.sp -= 1
+        return self.call_stack[self.sp]
+
+    def _op_stop(self, args):
+        self.is_finished = True
+        if args:
+            val = self.resolve_value(args[0])
+            self.output_buffer.write(f"STOP Result: {val}\n")
+
+    def _op_end(self, args):
+        # Sentinel: no instruction was loaded at this PC
+        self.last_error = f"End of program or invalid PC: {self.pc}"
+        self.is_finished = True
+        return self.pc
+
     def step(self):
         """Executes a single instruction."""
         if self.is_finished or self.input_needed > 0:
             return
 
-        if self.pc not in self.instructions:
-            self.last_error = f"End of program or invalid PC: {self.pc}"
+        pc = self.pc
+        try:
+            next_pc = self.handler_stream[pc](self.operand_stream[pc])
+            self.pc = pc + 1 if next_pc is None else next_pc
+
+        except Exception as e:
+            self.last_error = f"Error line {self.line_nos[pc]}: {str(e)}"
             self.is_finished = True
-            return
 
-        instr_data = self.instructions[self.pc]
-        line = instr_data["text"]
+    def run(self, max_steps, breakpoints=()):
+        """
+        Executes up to max_steps instructions and returns how many ran.
+
+        Stops early when the program finishes or waits for input, or before
+        executing an instruction whose PC is in breakpoints. Hot loop bodies
+        run through their compiled block, and fused pairs through their fused
+        record, instead of one dispatch each, unless breakpoints are set
+        (either could run straight past one).
+        Behaves exactly like calling step() that many times, but dispatches
+        inline and sets up a single try block for the whole batch.
+        """
+        # Locals: the loop below reads these on every instruction
+        handler_stream = self.handler_stream
+        operand_stream = self.operand_stream
+        compiled_blocks = self.compiled_blocks if not breakpoints else {}
+        fused_records = self.fused_records if not breakpoints else {}
+        block_hits = self.block_hits
+        executed = 0
+        try:
+            while (
+                executed < max_steps and not self.is_finished and not self.input_needed
+            ):
+                pc = self.pc
+                if pc in breakpoints:
+                    break
+
+                block = compiled_blocks.get(pc)
+                if block is not None:
+                    done, self.pc = block(
+                        self.memory, self.touched_memory, max_steps - executed
+                    )
+                    executed += done
+                    if done:
+                        continue
+                    # Not enough budget left, or the head instruction bailed
+                    # out; dispatch it normally (and report any error)
+
+                fused = fused_records.get(pc)
+                if fused is not None and executed + 2 <= max_steps:
+                    handler, args = fused
+                    next_pc = handler(args)
+                    executed += 2
+                else:
+                    next_pc = handler_stream[pc](operand_stream[pc])
+                    executed += 1
+                self.pc = pc + 1 if next_pc is None else next_pc
 
-        # --- IMPROVED TOKENIZER ---
-        # 1. Split Opcode (first word) from arguments
-        #    "BEQ (a1),( a2), eq" -> opcode="BEQ", rest="(a1),( a2), eq"
-        parts = line.split(maxsplit=1)
-        opcode = parts[0].upper()
-        args = []
-        if len(parts) > 1:
-            # 2. Split by comma to handle spaces within parentheses safely
-            args = [arg.strip() for arg in parts[1].split(",")]
+                # Count taken back-edges to find loop heads
+                if self.pc <= pc and not self.is_finished and not self.input_needed:
+                    hits = block_hits.get(self.pc, 0) + 1
+                    block_hits[self.pc] = hits
+                    if hits == HOT_BLOCK_THRESHOLD:
+                        self.compile_block(self.pc)
 
-        next_pc = self.pc + 1
+        except Exception as e:
+            # Same reporting as step(); the failed instruction counts as run.
+            # A fused pair can only fail in its first instruction.
+            self.last_error = f"Error line {self.line_nos[pc]}: {str(e)}"
+            self.is_finished = True
+            executed += 1
 
-        try:
-            if opcode == "MOV":
-                # MOV Dest, Src
-                val = self.resolve_value(args[1])
-                self.set_value(args[0], val)
-
-            elif opcode in ["ADD", "SUB", "MUL", "DIV"]:
-                # Arithmetic: OP Dest, Src1, Src2
-                val1 = self.resolve_value(args[1])
-                val2 = self.resolve_value(args[2])
-
-                res = 0
-                if opcode == "ADD":
-                    res = val1 + val2
-                elif opcode == "SUB":
-                    res = val1 - val2
-                elif opcode == "MUL":
-                    res = val1 * val2
-                elif opcode == "DIV":
-                    if val2 == 0:
-                        raise ValueError("Division by zero")
-                    res = val1 // val2
-
-                self.set_value(args[0], res)
-
-            elif opcode == "IN":
-                # IN Address, [Count]
-                # Supports Indirect: IN (A), 2
-                target_addr = self.resolve_write_target(args[0])
-
-                count = 1
-                if len(args) > 1:
-                    count = self.resolve_value(args[1])
-
-                if count > 0:
-                    self.input_needed = count
-                    self.input_dest_addr = target_addr
-                    # Do NOT advance PC yet
-                    return
-
-            elif opcode == "OUT":
-                # OUT Address, [Count]
-                # Supports Indirect: OUT (A) via resolve_value logic
-
-                # Logic check: OUT expects a value source.
-                # If args[0] is A, we want Mem[A].
-                # If args[0] is (A), we want Mem[Mem[A]].
-                # This is exactly what resolve_value does if we treat it as a value source.
-                # However, for array output, we need the start address.
-
-                # If format is OUT A, 5 -> We need address of A (which is A's value).
-                # If format is OUT (A), 5 -> We need address pointed to by A.
-
-                start_addr = 0
-                raw_arg = args[0].strip().upper()
-
-                # Check direct vs indirect manually to get the Start Address
-                if raw_arg.startswith("(") and raw_arg.endswith(")"):
-                    inner = raw_arg[1:-1]
-                    ptr_loc = self.resolve_symbol(inner)
-                    start_addr = self.memory[ptr_loc]
-                else:
-                    # Direct: OUT A -> Start address is value of symbol A
-                    start_addr = self.resolve_symbol(raw_arg)
-
-                count = 1
-                if len(args) > 1:
-                    count = self.resolve_value(args[1])
-
-                line_out = []
-                for i in range(count):
-                    curr = start_addr + i
-                    if curr < len(self.memory):
-                        line_out.append(str(self.memory[curr]))
-                self.output_buffer.append(" ".join(line_out))
-
-            elif opcode == "BEQ":
-                # BEQ Val1, Val2, Label
-                val1 = self.resolve_value(args[0])
-                val2 = self.resolve_value(args[1])
-                label = args[2].upper()
-
-                if val1 == val2:
-                    if label in self.labels:
-                        next_pc = self.labels[label]
-                    else:
-                        raise ValueError(f"Unknown label: {label}")
-
-            elif opcode == "BGT":
-                val1 = self.resolve_value(args[0])
-                val2 = self.resolve_value(args[1])
-                label = args[2].upper()
-
-                if val1 > val2:
-                    if label in self.labels:
-                        next_pc = self.labels[label]
-                    else:
-                        raise ValueError(f"Unknown label: {label}")
-
-            elif opcode == "JSR":
-                label = args[0].upper()
-                self.memory[self.sp] = next_pc
-                self.touched_memory.add(self.sp)
-                self.sp -= 1
-                if label in self.labels:
-                    next_pc = self.labels[label]
+        return executed
+
+    def compile_block(self, start_pc):
+        """
+        Compiles the run of MOV/ADD/SUB/MUL/DIV and BEQ/BGT instructions
+        starting at start_pc into a single function.
+
+        Only direct and immediate operands are supported. A branch back to
+        start_pc closes the run into a loop that repeats for as long as its
+        step budget allows; any other branch leaves the function when taken.
+
+        The function is called as block(memory, touched_memory, budget) and
+        returns (instructions completed, next PC). Anything that would raise
+        (division by zero, overflow) stops the block at that instruction so
+        it can be re-executed normally and report the error.
+        """
+        body = []
+        pcs = []  # PC of each compiled instruction, by position
+        pc = start_pc
+        closing = None
+        while True:
+            opcode = self.op_codes[pc]
+            args = self.operand_stream[pc]
+            if opcode in GENERIC_OPCODES:
+                opcode = GENERIC_OPCODES[opcode]
+                args = args[: len(OPERAND_ROLES[opcode])]
+
+            branch = None
+            if opcode in BRANCH_OPERATORS:
+                branch = (opcode, args)
+                opcode = None
+
+            if opcode is not None:
+                if opcode != OPC_MOV and opcode not in BLOCK_OPERATORS:
+                    break
+                if any(mode == MODE_INDIRECT for mode, _ in args):
+                    break
+                dest = args[0][1]
+                if not 0 <= dest < MEM_SIZE:
+                    break
+            if branch is not None:
+                if any(mode == MODE_INDIRECT for mode, _ in branch[1][:2]):
+                    break
+
+            count = len(pcs)
+            pcs.append(pc)
+            if opcode is not None:
+                srcs = [self._block_operand(arg) for arg in args[1:]]
+                if opcode == OPC_MOV:
+                    body.append(f"mem[{dest}] = {srcs[0]}")
+                elif opcode == OPC_DIV:
+                    body.append(f"d = {srcs[1]}")
+                    body.append(f"if d == 0: return done + {count}, {pc}")
+                    body.append(f"mem[{dest}] = {srcs[0]} // d")
                 else:
-                    raise ValueError(f"Unknown label: {label}")
+                    op = BLOCK_OPERATORS[opcode]
+                    body.append(f"mem[{dest}] = {srcs[0]} {op} {srcs[1]}")
+                body.append(f"touched[{dest}] = 1")
+            pc += 1
+            if branch is not None:
+                op = BRANCH_OPERATORS[branch[0]]
+                left, right = (self._block_operand(arg) for arg in branch[1][:2])
+                target = branch[1][2][1]
+                if target == start_pc:
+                    closing = f"{left} {op} {right}"
+                    break
+                body.append(
+                    f"if {left} {op} {right}: return done + {count + 1}, {target}"
+                )
+            body.append(f"n = {count + 1}")
+
+        length = len(pcs)
+        if closing is not None:
+            lines = [f"while done + {length} <= budget:"]
+            lines += ["    " + line for line in body]
+            lines += [
+                f"    if {closing}:",
+                f"        done += {length}",
+                "        n = 0",
+                "        continue",
+                f"    return done + {length}, {pc}",
+                f"return done, {start_pc}",
+            ]
+        elif length >= 2:
+            lines = [f"if {length} > budget: return 0, {start_pc}"]
+            lines += body
+            lines += [f"return {length}, {pc}"]
+        else:
+            return None
+
+        source = "\n".join(
+            ["def block(mem, touched, budget):", "    done = n = 0", "    try:"]
+            + ["        " + line for line in lines]
+            + ["    except Exception:", f"        return done + n, {tuple(pcs)}[n]"]
+        )
+        namespace = {}
+        exec(compile(source, f"<block@{start_pc}>", "exec"), namespace)
+        self.compiled_blocks[start_pc] = namespace["block"]
+        return namespace["block"]
+
+    def _block_operand(self, operand):
+        """Source text for a direct/immediate operand in a compiled block."""
+        mode, payload = operand
+        if mode == MODE_IMMEDIATE:
+            return f"({payload})"
+        return f"mem[{payload}]"
+
+
+class WrappingPicoEmulator(PicoEmulator):
+    """
+    PicoEmulator variant whose addresses wrap around the 64K address space
+    (addr & ADDRESS_MASK) like a 16-bit address bus, instead of raising
+    "out of bounds" errors. Memory accesses then need no bounds checks.
+    """
+
+    __slots__ = ()
+
+    def decode_operand(self, role, operand):
+        # Labels and immediates are not addresses; decode them as usual
+        if role == "L" or operand.startswith("#"):
+            return super().decode_operand(role, operand)
+        if role == "V":
+            val = _try_int(operand)
+            if val is not None:
+                return (MODE_IMMEDIATE, val)
+
+        if operand.startswith("(") and operand.endswith(")"):
+            addr = self.resolve_symbol(operand[1:-1].strip())
+            return (MODE_INDIRECT, addr & ADDRESS_MASK)
+        return (MODE_DIRECT, self.resolve_symbol(operand) & ADDRESS_MASK)
 
-            elif opcode == "RTS":
-                self.sp += 1
-                if self.sp >= len(self.memory):
-                    raise ValueError("Stack underflow")
-                next_pc = self.memory[self.sp]
+    def resolve_value(self, operand):
+        mode, payload = operand
+        if mode == MODE_IMMEDIATE:
+            return payload
+        if mode == MODE_DIRECT:
+            return self.memory[payload]
+        return self.memory[self.memory[payload] & ADDRESS_MASK]
 
-            elif opcode == "STOP":
-                self.is_finished = True
-                if args:
-                    val = self.resolve_value(args[0])
-                    self.output_buffer.append(f"STOP Result: {val}")
+    def resolve_write_target(self, operand):
+        mode, payload = operand
+        if mode == MODE_INDIRECT:
+            return self.memory[payload] & ADDRESS_MASK
+        return payload
 
-            self.pc = next_pc
+    def set_value(self, operand, value):
+        dest_addr = self.resolve_write_target(operand)
+        self.memory[dest_addr] = value
+        self.touched_memory[dest_addr] = 1
 
-        except Exception as e:
-            self.last_error = f"Error line {instr_data['line_no']}: {str(e)}"
-            self.is_finished = True
+    def provide_input(self, value):
+        # Multi-word input continues at address 0 after the last address
+        self.input_dest_addr &= ADDRESS_MASK
+        return super().provide_input(value)
@@ -1,5 +1,7 @@
 import sys
 import re
+import time
+from functools import lru_cache
 from PySide6.QtWidgets import (
     QApplication,
     QMainWindow,
@@ -7,8 +9,7 @@ from PySide6.QtWidgets import (
     QVBoxLayout,
     QHBoxLayout,
     QPushButton,
-    QTableWidget,
-    QTableWidgetItem,
+    QTableView,
     QLabel,
     QSplitter,
     QLineEdit,
@@ -31,7 +32,20 @@ from PySide6.QtWidgets import (
     QTreeWidget,
     QTreeWidgetItem,
 )
-from PySide6.QtCore import Qt, QTimer, QRect, QSize, QPoint, QStringListModel
+from PySide6.QtCore import (
+    Qt,
+    QEvent,
+    QTimer,
+    QRect,
+    QSize,
+    QPoint,
+    QStringListModel,
+    QAbstractTableModel,
+    QModelIndex,
+    QSignalBlocker,
+    Signal,
+    Slot,
+)
 from PySide6.QtGui import (
     QFont,
     QColor,
@@ -46,7 +60,30 @@ from PySide6.QtGui import (
     QKeySequence,
 )
 
-from emulator import PicoEmulator
+from emulator import PicoEmulator, WrappingPicoEmulator, MEM_SIZE
+
+# --- EXECUTION SPEED ---
+# The run timer never fires faster than RUN_TICK_MS (about one frame), and the
+# UI refreshes once per tick. Delays shorter than a tick run several
+# instructions per tick instead, so the instruction rate still follows the
+# delay. A delay of 0 runs batches of MAX_SPEED_BATCH instructions for up
+# to MAX_SPEED_BUDGET_S per tick.
+RUN_TICK_MS = 16
+MAX_SPEED_BATCH = 1000
+MAX_SPEED_BUDGET_S = 0.010
+# While a run is in progress the memory watch refreshes at most this often;
+# it is always brought up to date when the run stops
+MEMORY_REFRESH_S = 0.1
+
+# --- EDITOR ---
+# Syntax highlighting is switched off while the source is past either limit
+# (say, a huge pasted listing) and back on once it is below both
+HIGHLIGHT_MAX_CHARS = 512 * 1024
+HIGHLIGHT_MAX_LINES = 20000
+# Leading whitespace carried over to the next line on Enter
+INDENT_RE = re.compile(r"^(\s+)")
+# Typing one of these ends the word and closes the completion popup
+END_OF_WORD = frozenset("~!@#$%^&*()_+{}|:\"<>?,./;'[]\\-=")
 
 # --- COLOR PALETTE (Dracula Inspired) ---
 COLORS = {
@@ -66,7 +103,11 @@ COLORS = {
     "input_bg": "#44475a",
     "modal_bg": "#343746",
     "breakpoint": "#ff5555",
+    "gutter_bg": "#21222c",
 }
+# Parsed once: paint and highlight code reuse these instead of re-parsing hex
+QCOLORS = {name: QColor(value) for name, value in COLORS.items()}
+QBRUSHES = {name: QBrush(color) for name, color in QCOLORS.items()}
 
 # --- OPCODE REFERENCE DATA ---
 # Removed JMP, CMP, BLT as requested
@@ -86,6 +127,9 @@ OPCODE_REF = [
     ("ORG", "ORG Address", "Set starting memory address"),
 ]
 
+# Completer vocabulary: the mnemonics plus the usual variable names
+COMPLETER_WORDS = [x[0] for x in OPCODE_REF] + ["M", "N", "R", "A", "B", "I", "J"]
+
 
 # --- SETTINGS DIALOG ---
 class SettingsDialog(QDialog):
@@ -113,6 +157,12 @@ class SettingsDialog(QDialog):
         lbl = QLabel("Highlight Executing Line:")
         form_layout.addRow(lbl, self.cb_highlight)
 
+        self.cb_wrap = QCheckBox()
+        self.cb_wrap.setChecked(self.settings.get("wrap_addresses", False))
+
+        lbl = QLabel("Wrap Addresses (16-bit):")
+        form_layout.addRow(lbl, self.cb_wrap)
+
         layout.addLayout(form_layout)
         layout.addStretch()
 
@@ -122,41 +172,58 @@ class SettingsDialog(QDialog):
         layout.addWidget(buttons)
 
     def get_settings(self):
-        return {"highlight_execution": self.cb_highlight.isChecked()}
+        return {
+            "highlight_execution": self.cb_highlight.isChecked(),
+            "wrap_addresses": self.cb_wrap.isChecked(),
+        }
 
 
 # --- SYNTAX HIGHLIGHTER ---
 class AssemblyHighlighter(QSyntaxHighlighter):
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.highlighting_rules = []
 
-        keywords = [x[0] for x in OPCODE_REF]
+        keywords = "|".join(x[0] for x in OPCODE_REF)
         keyword_format = QTextCharFormat()
-        keyword_format.setForeground(QColor(COLORS["pink"]))
+        keyword_format.setForeground(QCOLORS["pink"])
         keyword_format.setFontWeight(QFont.Bold)
-        for word in keywords:
-            pattern = rf"\b{word}\b"
-            self.highlighting_rules.append(
-                (re.compile(pattern, re.IGNORECASE), keyword_format)
-            )
 
         label_format = QTextCharFormat()
-        label_format.setForeground(QColor(COLORS["green"]))
-        self.highlighting_rules.append((re.compile(r"^[A-Z_0-9]+:"), label_format))
+        label_format.setForeground(QCOLORS["green"])
 
         number_format = QTextCharFormat()
-        number_format.setForeground(QColor(COLORS["purple"]))
-        self.highlighting_rules.append((re.compile(r"\b\d+\b"), number_format))
+        number_format.setForeground(QCOLORS["purple"])
 
         comment_format = QTextCharFormat()
-        comment_format.setForeground(QColor(COLORS["comment"]))
-        self.highlighting_rules.append((re.compile(r";.*"), comment_format))
+        comment_format.setForeground(QCOLORS["comment"])
+
+        # One pass per block: the leftmost alternative wins, and a comment
+        # swallows the rest of the line. Labels stay case-sensitive.
+        self.token_re = re.compile(
+            rf"""
+            (?P<comment>;.*)
+            | (?P<label>(?-i:^[A-Z_0-9]+:))
+            | (?P<keyword>\b(?:{keywords})\b)
+            | (?P<number>\b\d+\b)
+            """,
+            re.VERBOSE | re.IGNORECASE,
+        )
+        self.token_formats = {
+            "comment": comment_format,
+            "label": label_format,
+            "keyword": keyword_format,
+            "number": number_format,
+        }
 
     def highlightBlock(self, text):
-        for pattern, format in self.highlighting_rules:
-            for match in pattern.finditer(text):
-                self.setFormat(match.start(), match.end() - match.start(), format)
+        formats = self.token_formats
+        for match in self.token_re.finditer(text):
+            start = match.start()
+            kind = match.lastgroup
+            self.setFormat(start, match.end() - start, formats[kind])
+            # A numeric label ("12:") keeps its digits in the number color
+            if kind == "label" and match[kind][:-1].isdigit():
+                self.setFormat(start, match.end() - start - 1, formats["number"])
 
 
 # --- CUSTOM EDITOR ---
@@ -183,15 +250,35 @@ class LineNumberArea(QWidget):
 
 
 class CodeEditor(QPlainTextEdit):
+    # Emitted whenever a breakpoint is set or cleared
+    breakpoints_changed = Signal()
+
     def __init__(self):
         super().__init__()
+        # Gutter width only changes with the digit count or the font
+        self.digit_advance = self.fontMetrics().horizontalAdvance("9")
+        self.gutter_digits = None
+        self.gutter_width = 0
+        self.gutter_font = QFont("Consolas", 10)
+        self.gutter_bold_font = QFont("Consolas", 10, QFont.Bold)
+        # Line highlight formats, shared by every highlight_lines() call
+        self.current_line_format = QTextCharFormat()
+        self.current_line_format.setBackground(QCOLORS["current_line"])
+        self.current_line_format.setProperty(QTextFormat.FullWidthSelection, True)
+        self.exec_line_format = QTextCharFormat()
+        self.exec_line_format.setBackground(QCOLORS["executing_line"])
+        self.exec_line_format.setProperty(QTextFormat.FullWidthSelection, True)
         self.line_number_area = LineNumberArea(self)
         self.blockCountChanged.connect(self.update_line_number_area_width)
         self.updateRequest.connect(self.update_line_number_area)
         self.cursorPositionChanged.connect(self.highlight_lines)
+        # Edits can move the highlighted blocks, so always rebuild after one
+        self.highlight_state = None
+        self.textChanged.connect(self.clear_highlight_state)
         self.update_line_number_area_width(0)
 
         self.execution_line_index = -1
+        self.exec_block_pos = None  # Document position of that line, cached
         self.show_execution_highlight = True
         self.breakpoints = set()
 
@@ -210,10 +297,7 @@ class CodeEditor(QPlainTextEdit):
         self.completer.setCompletionMode(QCompleter.PopupCompletion)
         self.completer.setCaseSensitivity(Qt.CaseInsensitive)
 
-        # Build keyword list
-        keywords = [x[0] for x in OPCODE_REF]
-        keywords += ["M", "N", "R", "A", "B", "I", "J"]
-        self.completer.setModel(QStringListModel(keywords, self.completer))
+        self.completer.setModel(QStringListModel(COMPLETER_WORDS, self.completer))
         self.completer.activated.connect(self.insert_completion)
 
     def insert_completion(self, completion):
@@ -249,7 +333,7 @@ class CodeEditor(QPlainTextEdit):
             cursor = self.textCursor()
             current_line = cursor.block().text()
             indentation = ""
-            match = re.match(r"^(\s+)", current_line)
+            match = INDENT_RE.match(current_line)
             if match:
                 indentation = match.group(1)
 
@@ -269,7 +353,6 @@ class CodeEditor(QPlainTextEdit):
         if not self.completer or (ctrl_or_shift and len(event.text()) == 0):
             return
 
-        eow = "~!@#$%^&*()_+{}|:\"<>?,./;'[]\\-="
         has_modifier = (event.modifiers() != Qt.NoModifier) and not ctrl_or_shift
 
         completion_prefix = self.text_under_cursor()
@@ -278,7 +361,7 @@ class CodeEditor(QPlainTextEdit):
             has_modifier
             or not event.text()
             or len(completion_prefix) < 1
-            or event.text()[-1] in eow
+            or event.text()[-1] in END_OF_WORD
         ):
             self.completer.popup().hide()
             return
@@ -298,11 +381,24 @@ class CodeEditor(QPlainTextEdit):
 
     def line_number_area_width(self):
         digits = len(str(max(1, self.blockCount())))
-        space = 3 + self.fontMetrics().horizontalAdvance("9") * digits
-        return space + 20
+        if digits != self.gutter_digits:
+            self.gutter_digits = digits
+            space = 3 + self.digit_advance * digits
+            self.gutter_width = space + 20
+        return self.gutter_width
 
     def update_line_number_area_width(self, _):
-        self.setViewportMargins(self.line_number_area_width(), 0, 0, 0)
+        # setViewportMargins relayouts the scroll area even for equal margins
+        width = self.line_number_area_width()
+        if width != self.viewportMargins().left():
+            self.setViewportMargins(width, 0, 0, 0)
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.FontChange:
+            self.digit_advance = self.fontMetrics().horizontalAdvance("9")
+            self.gutter_digits = None
+            self.update_line_number_area_width(0)
 
     def update_line_number_area(self, rect, dy):
         if dy:
@@ -327,36 +423,49 @@ class CodeEditor(QPlainTextEdit):
         else:
             self.breakpoints.add(line_num)
         self.line_number_area.update()
+        self.breakpoints_changed.emit()
 
     def set_execution_line(self, line_idx):
-        self.execution_line_index = line_idx
+        if line_idx != self.execution_line_index:
+            self.execution_line_index = line_idx
+            self.exec_block_pos = None  # Looked up again by highlight_lines
         self.highlight_lines()
         if line_idx >= 0:
-            block = self.document().findBlockByNumber(line_idx)
-            cursor = self.textCursor()
-            cursor.setPosition(block.position())
             self.ensureCursorVisible()
 
+    def clear_highlight_state(self):
+        self.highlight_state = None
+        self.exec_block_pos = None
+
     def highlight_lines(self):
+        # Moving within the same line changes nothing on screen
+        state = (
+            self.textCursor().blockNumber(),
+            self.execution_line_index,
+            self.show_execution_highlight,
+            self.isReadOnly(),
+        )
+        if state == self.highlight_state:
+            return
+        self.highlight_state = state
+
         extra_selections = []
         if not self.isReadOnly():
             selection = QTextEdit.ExtraSelection()
-            line_color = QColor(COLORS["current_line"])
-            selection.format.setBackground(line_color)
-            selection.format.setProperty(QTextFormat.FullWidthSelection, True)
+            selection.format = self.current_line_format
             selection.cursor = self.textCursor()
             selection.cursor.clearSelection()
             extra_selections.append(selection)
 
             if self.show_execution_highlight and self.execution_line_index >= 0:
                 exec_selection = QTextEdit.ExtraSelection()
-                exec_color = QColor(COLORS["executing_line"])
-                exec_selection.format.setBackground(exec_color)
-                exec_selection.format.setProperty(QTextFormat.FullWidthSelection, True)
+                exec_selection.format = self.exec_line_format
 
-                block = self.document().findBlockByNumber(self.execution_line_index)
+                if self.exec_block_pos is None:
+                    block = self.document().findBlockByNumber(self.execution_line_index)
+                    self.exec_block_pos = block.position()
                 cursor = self.textCursor()
-                cursor.setPosition(block.position())
+                cursor.setPosition(self.exec_block_pos)
 
                 exec_selection.cursor = cursor
                 exec_selection.cursor.clearSelection()
@@ -366,7 +475,12 @@ class CodeEditor(QPlainTextEdit):
 
     def lineNumberAreaPaintEvent(self, event):
         painter = QPainter(self.line_number_area)
-        painter.fillRect(event.rect(), QColor("#21222c"))
+        rect = event.rect()
+        painter.fillRect(rect, QCOLORS["gutter_bg"])
+        # Only blocks overlapping the dirty rect are drawn
+        rect_top = rect.top()
+        rect_bottom = rect.bottom()
+        text_width = self.line_number_area.width() - 5
 
         block = self.firstVisibleBlock()
         block_number = block.blockNumber()
@@ -375,33 +489,33 @@ class CodeEditor(QPlainTextEdit):
 
         height = self.fontMetrics().height()
 
-        while block.isValid() and top <= event.rect().bottom():
-            if block.isVisible() and bottom >= event.rect().top():
+        while block.isValid() and top <= rect_bottom:
+            if block.isVisible() and bottom >= rect_top:
                 number = str(block_number + 1)
-                painter.setPen(QColor(COLORS["comment"]))
+                painter.setPen(QCOLORS["comment"])
 
                 if block_number in self.breakpoints:
-                    painter.setBrush(QBrush(QColor(COLORS["breakpoint"])))
+                    painter.setBrush(QBRUSHES["breakpoint"])
                     painter.setPen(Qt.NoPen)
                     radius = height / 3
                     cy = top + height / 2 - 2
                     cx = 8
                     painter.drawEllipse(QPoint(int(cx), int(cy)), radius, radius)
-                    painter.setPen(QColor(COLORS["fg"]))
+                    painter.setPen(QCOLORS["fg"])
 
                 if (
                     block_number == self.execution_line_index
                     and self.show_execution_highlight
                 ):
-                    painter.setPen(QColor(COLORS["green"]))
-                    painter.setFont(QFont("Consolas", 10, QFont.Bold))
+                    painter.setPen(QCOLORS["green"])
+                    painter.setFont(self.gutter_bold_font)
                 else:
-                    painter.setFont(QFont("Consolas", 10))
+                    painter.setFont(self.gutter_font)
 
                 painter.drawText(
                     0,
                     int(top),
-                    self.line_number_area.width() - 5,
+                    text_width,
                     height,
                     Qt.AlignRight,
                     number,
@@ -441,6 +555,7 @@ class ReferenceDock(QDockWidget):
         """
         )
 
+        items = []
         for op, syntax, desc in OPCODE_REF:
             item = QTreeWidgetItem([op, desc])
             # Store syntax in data for tooltip or insertion
@@ -448,8 +563,10 @@ class ReferenceDock(QDockWidget):
             item.setToolTip(0, syntax)
             item.setToolTip(1, desc)
             # Color styling
-            item.setForeground(0, QBrush(QColor(COLORS["pink"])))
-            self.tree.addTopLevelItem(item)
+            item.setForeground(0, QBRUSHES["pink"])
+            items.append(item)
+        # Styled before insertion, and inserted in one go (one model update)
+        self.tree.addTopLevelItems(items)
 
         self.tree.itemDoubleClicked.connect(self.insert_instruction)
         self.setWidget(self.tree)
@@ -463,8 +580,118 @@ class ReferenceDock(QDockWidget):
         self.editor.setFocus()
 
 
+# --- MEMORY WATCH MODEL ---
+@lru_cache(maxsize=4096)
+def _value_text(value):
+    # Watched values repeat a lot between repaints (counters, operands)
+    return str(value)
+
+
+class MemoryWatchModel(QAbstractTableModel):
+    # Emitted with (address, text) when a VAL cell is edited in the view
+    value_edited = Signal(int, str)
+
+    HEADERS = ["VAR", "ADDR", "VAL"]
+
+    def __init__(self, emu, parent=None):
+        super().__init__(parent)
+        self.emu = emu
+        self.names = {}  # Address -> var name, snapshot of the loaded program
+        self.touched = None  # touched_addresses() the rows were built from
+        self.rows = []  # (var name or "", address), sorted by address
+        self.addr_texts = []  # Address column text, built with the rows
+        self.values = []  # Value shown in each row, as of the last refresh()
+        self.name_color = QCOLORS["orange"]
+        self.value_color = QCOLORS["cyan"]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        # QModelIndex accessors cross into C++, so read each of them once
+        row = index.row()
+        column = index.column()
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            if column == 2:
+                return _value_text(self.values[row])
+            if column == 1:
+                return self.addr_texts[row]
+            return self.rows[row][0]
+        if role == Qt.ForegroundRole:
+            if column == 0:
+                return self.name_color
+            if column == 2:
+                return self.value_color
+        if role == Qt.TextAlignmentRole and column > 0:
+            return Qt.AlignCenter
+        return None
+
+    def flags(self, index):
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if index.column() == 2:
+            flags |= Qt.ItemIsEditable  # Only values are editable
+        return flags
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole or index.column() != 2:
+            return False
+        self.value_edited.emit(self.rows[index.row()][1], str(value))
+        return True
+
+    def load(self):
+        # Variable bindings only change when a program is parsed
+        self.names = {addr: name for name, addr in self.emu.registers.items()}
+        self.touched = None
+
+    def refresh(self):
+        # Named variables AND any memory address written so far
+        touched = self.emu.touched_addresses()
+        if touched == self.touched:
+            rows = self.rows
+        else:
+            self.touched = touched
+            names = self.names
+            addresses = set(names)
+            addresses.update(touched)
+            rows = [(names.get(addr, ""), addr) for addr in sorted(addresses)]
+        memory = self.emu.memory
+        values = [memory[addr] if 0 <= addr < MEM_SIZE else 0 for _, addr in rows]
+
+        if rows != self.rows:
+            self.beginResetModel()
+            self.rows = rows
+            self.addr_texts = [str(addr) for _, addr in rows]
+            self.values = values
+            self.endResetModel()
+            return
+
+        # Same rows: notify only the span of values that actually changed
+        changed = [
+            row for row, (old, new) in enumerate(zip(self.values, values)) if old != new
+        ]
+        self.values = values
+        if changed:
+            self.dataChanged.emit(
+                self.index(changed[0], 2), self.index(changed[-1], 2), [Qt.DisplayRole]
+            )
+
+
 # --- MAIN WINDOW ---
 class MainWindow(QMainWindow):
+    INPUT_ACTIVE_STYLE = f"background-color: {COLORS['yellow']}; color: black; border: 2px solid {COLORS['orange']};"
+    INPUT_IDLE_STYLE = f"background-color: {COLORS['input_bg']}; color: {COLORS['fg']};"
+    STATUS_STYLES = {
+        name: f"color: {value}; font-weight: bold;" for name, value in COLORS.items()
+    }
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("PicoComputer IDE")
@@ -473,19 +700,31 @@ class MainWindow(QMainWindow):
 
         self.emu = PicoEmulator()
         self.timer = QTimer()
-        self.timer.timeout.connect(self.step_execution)
+        # Same-thread timer: call step_execution directly, never queued
+        self.timer.timeout.connect(self.step_execution, Qt.DirectConnection)
+        # One shot per tick, re-armed by step_execution once its batch is
+        # done, so slow batches can't queue up ticks and starve repaints
+        self.timer.setSingleShot(True)
+        self.tick_ms = RUN_TICK_MS  # Timer interval while running
+        self.steps_per_tick = 1  # Instructions per timer tick while running
+        self.input_state = None  # "waiting_input" or "idle", last styled
+        self.shown_pc = None  # PC and cycle count the labels last showed
+        self.shown_cycles = None
+        self.shown_state = None  # (pc, cycles, input, finished) last drawn
+        self.mem_refreshed_at = 0.0  # time.monotonic() of the last table refresh
 
         self.current_file_path = None
-        self.table_items_cache = {}
         self.pc_to_line_map = {}
+        self.breakpoint_pc_set = None  # PCs of breakpoint lines, see breakpoint_pcs
         self.is_auto_running = False
         self.cycle_count = 0
 
         # Tracking "Dirty" state to ensure we always run latest code
         self.is_code_dirty = True
         self.program_entry_point = 0
+        self.loaded_code = None  # Source of the last successful parse
 
-        self.app_settings = {"highlight_execution": True}
+        self.app_settings = {"highlight_execution": True, "wrap_addresses": False}
 
         self.ignore_breakpoint_once = False
 
@@ -497,6 +736,7 @@ class MainWindow(QMainWindow):
 
         # Connect editor change to dirty flag
         self.editor.textChanged.connect(self.on_code_changed)
+        self.editor.breakpoints_changed.connect(self.clear_breakpoint_pcs)
 
     def apply_styles(self):
         qss = f"""
@@ -509,7 +749,7 @@ class MainWindow(QMainWindow):
                 border: none;
             }}
             
-            QTableWidget {{ 
+            QTableView {{ 
                 background-color: {COLORS['bg']}; 
                 gridline-color: {COLORS['current_line']};
                 border: 1px solid {COLORS['current_line']};
@@ -619,15 +859,15 @@ class MainWindow(QMainWindow):
         toolbar.addWidget(lbl_speed)
 
         self.slider_speed = QSlider(Qt.Horizontal)
-        self.slider_speed.setRange(10, 1000)
-        self.slider_speed.setValue(100)
+        self.slider_speed.setRange(0, 1000)
+        self.slider_speed.setValue(RUN_TICK_MS)
         self.slider_speed.setFixedWidth(100)
         self.slider_speed.valueChanged.connect(self.change_speed_from_slider)
         toolbar.addWidget(self.slider_speed)
 
         self.spin_speed = QSpinBox()
-        self.spin_speed.setRange(10, 1000)
-        self.spin_speed.setValue(100)
+        self.spin_speed.setRange(0, 1000)
+        self.spin_speed.setValue(RUN_TICK_MS)
         self.spin_speed.setFixedWidth(60)
         self.spin_speed.valueChanged.connect(self.change_speed_from_spin)
         toolbar.addWidget(self.spin_speed)
@@ -680,37 +920,49 @@ class MainWindow(QMainWindow):
         )
         status_layout = QHBoxLayout(status_frame)
 
-        self.lbl_status = QLabel("IDLE")
-        self.lbl_status.setStyleSheet(f"color: {COLORS['pink']}; font-weight: bold;")
+        self.lbl_status = QLabel()
+        self.status_text = None  # Text and palette color lbl_status shows
+        self.status_color = None
+        self.set_status("IDLE", "pink")
 
-        self.lbl_cycles = QLabel("CYCLES: 0")
-        self.lbl_cycles.setStyleSheet(
-            f"color: {COLORS['yellow']}; font-family: Consolas;"
-        )
+        # Counters keep a fixed prefix label, so ticks only set the number
+        cycles_style = f"color: {COLORS['yellow']}; font-family: Consolas;"
+        lbl_cycles_prefix = QLabel("CYCLES:")
+        lbl_cycles_prefix.setStyleSheet(cycles_style)
+        self.lbl_cycles = QLabel("0")
+        self.lbl_cycles.setStyleSheet(cycles_style)
 
-        self.lbl_pc = QLabel("PC: 000")
-        self.lbl_pc.setStyleSheet(f"color: {COLORS['cyan']}; font-family: Consolas;")
+        pc_style = f"color: {COLORS['cyan']}; font-family: Consolas;"
+        lbl_pc_prefix = QLabel("PC:")
+        lbl_pc_prefix.setStyleSheet(pc_style)
+        self.lbl_pc = QLabel("000")
+        self.lbl_pc.setStyleSheet(pc_style)
 
         status_layout.addWidget(QLabel("STATUS:"))
         status_layout.addWidget(self.lbl_status)
         status_layout.addStretch()
+        status_layout.addWidget(lbl_cycles_prefix)
         status_layout.addWidget(self.lbl_cycles)
         status_layout.addSpacing(20)
+        status_layout.addWidget(lbl_pc_prefix)
         status_layout.addWidget(self.lbl_pc)
         right_layout.addWidget(status_frame)
 
         # Memory Table Configuration
         right_layout.addWidget(QLabel("MEMORY WATCH (Double-click Value to Edit)"))
-        self.mem_table = QTableWidget()
-        self.mem_table.setColumnCount(3)
-        self.mem_table.setHorizontalHeaderLabels(["VAR", "ADDR", "VAL"])
+        self.mem_model = MemoryWatchModel(self.emu, self)
+        self.mem_table = QTableView()
+        self.mem_table.setModel(self.mem_model)
         self.mem_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.mem_table.verticalHeader().setVisible(False)
+        # Uniform row heights, never measured from the cells
+        self.mem_table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.mem_table.verticalHeader().setDefaultSectionSize(22)
         self.mem_table.setShowGrid(False)
         self.mem_table.setAlternatingRowColors(True)
         self.mem_table.setStyleSheet(f"alternate-background-color: #2e303e;")
 
-        self.mem_table.itemChanged.connect(self.handle_memory_edit)
+        self.mem_model.value_edited.connect(self.handle_memory_edit)
 
         right_layout.addWidget(self.mem_table)
 
@@ -748,6 +1000,16 @@ class MainWindow(QMainWindow):
         self.dock = ReferenceDock(self, self.editor)
         self.addDockWidget(Qt.RightDockWidgetArea, self.dock)
 
+    # --- STATUS LOGIC ---
+    def set_status(self, text, color=None):
+        # Only touch what changed: a new stylesheet re-polishes the label
+        if text != self.status_text:
+            self.status_text = text
+            self.lbl_status.setText(text)
+        if color is not None and color != self.status_color:
+            self.status_color = color
+            self.lbl_status.setStyleSheet(self.STATUS_STYLES[color])
+
     # --- DOCK LOGIC ---
     def toggle_dock(self):
         if self.dock.isVisible():
@@ -756,21 +1018,26 @@ class MainWindow(QMainWindow):
             self.dock.show()
 
     # --- SPEED CONTROL LOGIC ---
+    @Slot(int)
     def change_speed_from_slider(self, value):
-        self.spin_speed.blockSignals(True)
-        self.spin_speed.setValue(value)
-        self.spin_speed.blockSignals(False)
+        with QSignalBlocker(self.spin_speed):
+            self.spin_speed.setValue(value)
         self.update_timer_interval(value)
 
+    @Slot(int)
     def change_speed_from_spin(self, value):
-        self.slider_speed.blockSignals(True)
-        self.slider_speed.setValue(value)
-        self.slider_speed.blockSignals(False)
+        with QSignalBlocker(self.slider_speed):
+            self.slider_speed.setValue(value)
         self.update_timer_interval(value)
 
     def update_timer_interval(self, value):
+        if value == 0:
+            self.steps_per_tick = MAX_SPEED_BATCH
+        else:
+            self.steps_per_tick = max(1, round(RUN_TICK_MS / value))
+        self.tick_ms = max(value, RUN_TICK_MS)
         if self.timer.isActive():
-            self.timer.setInterval(value)
+            self.timer.setInterval(self.tick_ms)
 
     # --- LOGIC ---
     def open_settings(self):
@@ -782,14 +1049,42 @@ class MainWindow(QMainWindow):
             ]
             self.editor.highlight_lines()
 
+            # Out-of-range addresses either raise or wrap, depending on the
+            # emulator class; switching rebuilds the program on a fresh one
+            wrap = self.app_settings["wrap_addresses"]
+            if wrap != isinstance(self.emu, WrappingPicoEmulator):
+                self.emu = WrappingPicoEmulator() if wrap else PicoEmulator()
+                self.mem_model.emu = self.emu
+                self.loaded_code = None
+                self.reset_program()
+
+    @Slot()
     def on_code_changed(self):
         self.is_code_dirty = True
-        self.lbl_status.setText("MODIFIED")
-        self.lbl_status.setStyleSheet(f"color: {COLORS['orange']}; font-weight: bold;")
+        self.set_status("MODIFIED", "orange")
         # We don't disable Run, because Run will now auto-build.
         # We disable Step because stepping on dirty code is confusing.
         self.act_step.setEnabled(False)
 
+        # Deferred: swapping the document mid-edit re-enters the layout update
+        QTimer.singleShot(0, self.update_highlighter)
+
+    def update_highlighter(self):
+        document = self.editor.document()
+        enabled = (
+            document.characterCount() <= HIGHLIGHT_MAX_CHARS
+            and document.blockCount() <= HIGHLIGHT_MAX_LINES
+        )
+        if enabled != (self.highlighter.document() is not None):
+            self.highlighter.setDocument(document if enabled else None)
+
+    def set_editor_text(self, text):
+        # Replaces the whole document: detach the highlighter so the load is
+        # highlighted once at most (and never if it is over the limits)
+        self.highlighter.setDocument(None)
+        self.editor.setPlainText(text)
+        self.update_highlighter()
+
     def load_default_code(self):
         default_code = """; Click left margin to toggle breakpoints
 M = 1
@@ -808,7 +1103,7 @@ BGT R, 0, LOOP
 OUT M, 1     ; Output
 STOP
 """
-        self.editor.setPlainText(default_code)
+        self.set_editor_text(default_code)
         # Manually load it so the entry point is calculated
         self.load_program()
 
@@ -821,7 +1116,7 @@ STOP
         )
         if file_path:
             with open(file_path, "r") as f:
-                self.editor.setPlainText(f.read())
+                self.set_editor_text(f.read())
             self.current_file_path = file_path
             self.console_out.append(f">>> Loaded: {file_path}")
             self.load_program()
@@ -839,46 +1134,23 @@ STOP
             f.write(self.editor.toPlainText())
         self.console_out.append(f">>> Saved: {self.current_file_path}")
 
-    def build_sourcemap(self, code_text):
-        self.pc_to_line_map = {}
-        lines = code_text.split("\n")
-        current_address = 0
-
-        def is_instruction(line):
-            line = line.split(";")[0].strip()
-            if not line:
-                return False
-            if line.endswith(":"):
-                return False
-            parts = line.split()
-            if not parts:
-                return False
-
-            nonlocal current_address
-            if parts[0].upper() == "ORG" and len(parts) > 1:
-                try:
-                    current_address = int(parts[1])
-                except:
-                    pass
-                return False
-
-            if "=" in line:
-                return False
-            return True
-
-        for i, line in enumerate(lines):
-            if is_instruction(line):
-                self.pc_to_line_map[current_address] = i
-                current_address += 1
-
+    @Slot()
     def load_program(self):
         # 1. Sanitize Input
         code = self.editor.toPlainText()
 
         try:
-            # 2. Parse Code
-            self.emu.parse(code)
-            self.build_sourcemap(code)
+            # 2. Parse Code (unless it is the program already loaded)
+            if code == self.loaded_code:
+                self.emu.restart()
+            else:
+                self.loaded_code = None  # A failed parse leaves nothing loaded
+                self.emu.parse(code)
+                self.pc_to_line_map = self.emu.source_map()
+                self.breakpoint_pc_set = None
+                self.loaded_code = code
+            self.mem_model.load()
+            self.shown_state = None  # Fresh memory: always redraw
 
             # 3. Determine Entry Point
             # The emulator.parse method leaves self.emu.pc at the ORG address
@@ -893,13 +1165,8 @@ STOP
 
             self.act_run.setEnabled(True)
             self.act_step.setEnabled(True)
-            self.lbl_status.setText("READY")
-            self.lbl_status.setStyleSheet(
-                f"color: {COLORS['green']}; font-weight: bold;"
-            )
+            self.set_status("READY", "green")
 
-            self.mem_table.setRowCount(0)
-            self.table_items_cache = {}
             self.editor.set_execution_line(-1)
             self.is_auto_running = False
             self.is_code_dirty = False
@@ -912,11 +1179,11 @@ STOP
 
         except Exception as e:
             self.console_out.append(f"ERR> {str(e)}")
-            self.lbl_status.setText("PARSE ERROR")
-            self.lbl_status.setStyleSheet(f"color: {COLORS['red']}; font-weight: bold;")
+            self.set_status("PARSE ERROR", "red")
             QMessageBox.critical(self, "Parse Error", str(e))
             return False
 
+    @Slot()
     def reset_program(self):
         """Re-loads the program to ensure memory is wiped and state is fresh."""
         self.timer.stop()
@@ -930,6 +1197,7 @@ STOP
             self.emu.pc = self.program_entry_point
             self.update_ui()
 
+    @Slot()
     def toggle_run(self):
         # Auto-Build if dirty
         if self.is_code_dirty:
@@ -937,24 +1205,25 @@ STOP
             if not success:
                 return  # Do not run if build failed
 
-        if self.timer.isActive():
+        # The single-shot timer is idle while a batch runs, so is_auto_running
+        # (not timer.isActive()) is the run state
+        if self.is_auto_running:
             # STOPPING
             self.timer.stop()
             self.is_auto_running = False
             self.act_run.setText("Run")
-            self.lbl_status.setText("PAUSED")
-            self.lbl_status.setStyleSheet(
-                f"color: {COLORS['orange']}; font-weight: bold;"
-            )
+            self.set_status("PAUSED", "orange")
+            self.mem_model.refresh()  # Catch up on throttled refreshes
         else:
             # STARTING
             if self.emu.is_finished:
                 # Reset if finished
                 self.emu.pc = self.program_entry_point
+                self.emu.sp = 0  # Drop frames left by a STOP inside a subroutine
                 self.emu.is_finished = False
                 self.emu.input_needed = 0
                 self.cycle_count = 0
-                self.emu.output_buffer = []
+                self.emu.get_output()  # Discard leftovers
                 self.console_out.append(">>> Restarting...")
 
             # FIX: Handling starting FROM a breakpoint
@@ -969,13 +1238,11 @@ STOP
 
             # Now we are safely off the breakpoint, start the timer
             self.is_auto_running = True
-            self.timer.start(self.slider_speed.value())
+            self.timer.start(self.tick_ms)
             self.act_run.setText("Stop")
-            self.lbl_status.setText("RUNNING")
-            self.lbl_status.setStyleSheet(
-                f"color: {COLORS['green']}; font-weight: bold;"
-            )
+            self.set_status("RUNNING", "green")
 
+    @Slot()
     def manual_step(self):
         if self.is_code_dirty:
             success = self.load_program()
@@ -987,6 +1254,7 @@ STOP
         self.act_run.setText("Run")
         self.step_execution()
 
+    @Slot()
     def step_execution(self):
         # 1. Breakpoint Check
         current_line = self.pc_to_line_map.get(self.emu.pc, -1)
@@ -994,12 +1262,12 @@ STOP
             self.timer.stop()
             self.is_auto_running = False
             self.act_run.setText("Run")
-            self.lbl_status.setText("BREAKPOINT")
-            self.lbl_status.setStyleSheet(f"color: {COLORS['red']}; font-weight: bold;")
+            self.set_status("BREAKPOINT", "red")
             self.console_out.append(
                 f"LOG> Paused at Breakpoint (Line {current_line+1})"
             )
             self.editor.set_execution_line(current_line)
+            self.mem_model.refresh()  # Catch up on throttled refreshes
             return
 
         # 2. Status Check (Fix for Cycle Counting Issue)
@@ -1008,50 +1276,89 @@ STOP
             self.update_ui()
             return
 
-        # 3. Perform Step
-        self.emu.step()
-        self.cycle_count += 1
+        # 3. Perform Step (a batch per tick while running, then one refresh)
+        if self.is_auto_running:
+            run = self.emu.run
+            breakpoints = self.breakpoint_pcs()
+            executed = total = run(self.steps_per_tick, breakpoints)
+            if self.steps_per_tick == MAX_SPEED_BATCH:
+                # Fill the tick, leaving the rest of it for repaints and input
+                clock = time.perf_counter
+                deadline = clock() + MAX_SPEED_BUDGET_S
+                while executed == MAX_SPEED_BATCH and clock() < deadline:
+                    executed = run(MAX_SPEED_BATCH, breakpoints)
+                    total += executed
+            self.cycle_count += total
+        else:
+            self.emu.step()
+            self.cycle_count += 1
         self.update_ui()
 
-    def handle_memory_edit(self, item):
-        if item.column() != 2:
-            return
+        # 4. Schedule the next tick (update_ui handles finish and input waits)
+        if self.is_auto_running and not self.emu.input_needed:
+            self.timer.start(self.tick_ms)
 
-        row = item.row()
-        addr_item = self.mem_table.item(row, 1)
-        if not addr_item:
-            return
+    def breakpoint_pcs(self):
+        # Cached: only breakpoint toggles and rebuilds change the answer
+        if self.breakpoint_pc_set is None:
+            breakpoints = self.editor.breakpoints
+            self.breakpoint_pc_set = frozenset(
+                pc for pc, line in self.pc_to_line_map.items() if line in breakpoints
+            )
+        return self.breakpoint_pc_set
 
+    @Slot()
+    def clear_breakpoint_pcs(self):
+        self.breakpoint_pc_set = None
+
+    @Slot(int, str)
+    def handle_memory_edit(self, addr, new_val_str):
         try:
-            addr = int(addr_item.text())
-            new_val_str = item.text()
             new_val = int(new_val_str)
 
-            if isinstance(self.emu.memory, list):
-                if 0 <= addr < len(self.emu.memory):
-                    self.emu.memory[addr] = new_val
-                    self.console_out.append(f"LOG> Memory [{addr}] set to {new_val}")
+            if 0 <= addr < MEM_SIZE:
+                self.emu.memory[addr] = new_val
+                self.console_out.append(f"LOG> Memory [{addr}] set to {new_val}")
+                self.mem_model.refresh()
 
-        except ValueError:
+        except (ValueError, OverflowError):
             QMessageBox.warning(self, "Invalid Value", "Please enter a valid integer.")
             self.update_ui()
 
+    @Slot()
     def update_ui(self):
-        self.lbl_pc.setText(f"PC: {self.emu.pc}")
-        self.lbl_cycles.setText(f"CYCLES: {self.cycle_count}")
-
-        if self.app_settings["highlight_execution"]:
+        # Nothing to redraw unless an instruction ran or an input landed
+        # since the last refresh (load_program clears this after a parse)
+        state = (
+            self.emu.pc,
+            self.cycle_count,
+            self.emu.input_needed,
+            self.emu.is_finished,
+        )
+        redraw = state != self.shown_state
+        self.shown_state = state
+
+        # Relabel only on change (nothing moves while waiting for input)
+        if self.emu.pc != self.shown_pc:
+            self.shown_pc = self.emu.pc
+            self.lbl_pc.setText(_value_text(self.shown_pc))
+        if self.cycle_count != self.shown_cycles:
+            self.shown_cycles = self.cycle_count
+            self.lbl_cycles.setText(str(self.shown_cycles))
+
+        if redraw and self.app_settings["highlight_execution"]:
             line_idx = self.pc_to_line_map.get(self.emu.pc, -1)
             self.editor.set_execution_line(line_idx)
 
-        # Output logic
-        if self.emu.output_buffer:
-            for line in self.emu.output_buffer:
-                self.console_out.append(f"OUT> {line}")
-                self.console_out.verticalScrollBar().setValue(
-                    self.console_out.verticalScrollBar().maximum()
-                )
-            self.emu.output_buffer = []
+        # Output logic (one append per refresh, however many lines arrived)
+        output = self.emu.get_output()
+        if output:
+            self.console_out.setUpdatesEnabled(False)
+            self.console_out.append("\n".join(f"OUT> {line}" for line in output))
+            self.console_out.setUpdatesEnabled(True)
+            self.console_out.verticalScrollBar().setValue(
+                self.console_out.verticalScrollBar().maximum()
+            )
 
         # Status checks
         if self.emu.is_finished:
@@ -1059,86 +1366,40 @@ STOP
             self.is_auto_running = False
             self.act_run.setText("Run")
             if self.emu.last_error:
-                self.lbl_status.setText("RUNTIME ERROR")
-                self.lbl_status.setStyleSheet(
-                    f"color: {COLORS['red']}; font-weight: bold;"
-                )
+                self.set_status("RUNTIME ERROR", "red")
                 self.console_out.append(f"ERR> {self.emu.last_error}")
             else:
-                self.lbl_status.setText("FINISHED")
-                self.lbl_status.setStyleSheet(
-                    f"color: {COLORS['cyan']}; font-weight: bold;"
-                )
+                self.set_status("FINISHED", "cyan")
                 self.console_out.append(">>> Execution Finished.")
 
         elif self.emu.input_needed > 0:
-            if self.timer.isActive():
-                self.timer.stop()
-                self.act_run.setText("Run")
+            # is_auto_running stays set so handle_input() can resume the run
+            self.timer.stop()
+            self.act_run.setText("Run")
 
-            self.lbl_status.setText(f"WAITING INPUT ({self.emu.input_needed})")
-            self.lbl_status.setStyleSheet(
-                f"color: {COLORS['yellow']}; font-weight: bold;"
-            )
-            self.input_field.setEnabled(True)
-            self.input_field.setStyleSheet(
-                f"background-color: {COLORS['yellow']}; color: black; border: 2px solid {COLORS['orange']};"
-            )
+            self.set_status(f"WAITING INPUT ({self.emu.input_needed})", "yellow")
+            # Restyling re-polishes the widget, so only do it on a change
+            if self.input_state != "waiting_input":
+                self.input_state = "waiting_input"
+                self.input_field.setEnabled(True)
+                self.input_field.setStyleSheet(self.INPUT_ACTIVE_STYLE)
             self.input_field.setFocus()
-        else:
+        elif self.input_state != "idle":
+            self.input_state = "idle"
             self.input_field.setEnabled(False)
-            self.input_field.setStyleSheet(
-                f"background-color: {COLORS['input_bg']}; color: {COLORS['fg']};"
-            )
+            self.input_field.setStyleSheet(self.INPUT_IDLE_STYLE)
 
-        # --- REBUILT MEMORY TABLE LOGIC ---
-        # 1. Gather all addresses to display
-        #    This combines named variables (registers) AND any memory address
-        #    that has been written to (touched_memory)
-        all_addresses = set(self.emu.registers.values()) | self.emu.touched_memory
-        sorted_addresses = sorted(list(all_addresses))
-
-        # Map Address -> Name for display
-        addr_to_name = {v: k for k, v in self.emu.registers.items()}
-
-        # 2. Rebuild the table entirely
-        self.mem_table.blockSignals(True)  # Prevent events while building
-        self.mem_table.setRowCount(len(sorted_addresses))
-
-        for row, addr in enumerate(sorted_addresses):
-            # Retrieve value safely
-            val = 0
-            try:
-                if isinstance(self.emu.memory, list):
-                    val = self.emu.memory[addr]
-                else:
-                    val = self.emu.memory.get(addr, 0)
-            except:
-                val = 0
-
-            var_name = addr_to_name.get(addr, "")
-
-            # Create fresh items for this row
-            i_name = QTableWidgetItem(var_name)
-            i_name.setForeground(QColor(COLORS["orange"]))
-            i_name.setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable)  # Read-only
-
-            i_addr = QTableWidgetItem(str(addr))
-            i_addr.setTextAlignment(Qt.AlignCenter)
-            i_addr.setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable)  # Read-only
-
-            i_val = QTableWidgetItem(str(val))
-            i_val.setTextAlignment(Qt.AlignCenter)
-            i_val.setForeground(QColor(COLORS["cyan"]))
-            i_val.setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsEditable)
-
-            self.mem_table.setItem(row, 0, i_name)
-            self.mem_table.setItem(row, 1, i_addr)
-            self.mem_table.setItem(row, 2, i_val)
-
-        self.mem_table.blockSignals(False)
+        # --- MEMORY TABLE LOGIC ---
+        running = self.is_auto_running and not (
+            self.emu.is_finished or self.emu.input_needed
+        )
+        now = time.monotonic()
+        if redraw and (not running or now - self.mem_refreshed_at >= MEMORY_REFRESH_S):
+            self.mem_refreshed_at = now
+            self.mem_model.refresh()
         # --- END TABLE LOGIC ---
 
+    @Slot()
     def handle_input(self):
         text = self.input_field.text()
         if not text:
@@ -1152,13 +1413,10 @@ STOP
             if self.emu.input_needed == 0:
                 if self.is_auto_running:
                     self.act_run.setText("Stop")
-                    self.lbl_status.setText("RUNNING")
-                    self.lbl_status.setStyleSheet(
-                        f"color: {COLORS['green']}; font-weight: bold;"
-                    )
-                    self.timer.start(self.slider_speed.value())
+                    self.set_status("RUNNING", "green")
+                    self.timer.start(self.tick_ms)
                 else:
-                    self.lbl_status.setText("READY")
+                    self.set_status("READY")
         else:
             QMessageBox.warning(self, "Input Error", "Invalid Integer")
 